@@ -4,22 +4,37 @@ BSP Indexer - 서버 측 고속 인덱싱 스크립트
 Yocto/BSP 프로젝트를 로컬 파일 시스템에서 직접 파싱하여 SQLite DB 생성
 
 사용법:
-    python3 bsp_indexer.py /path/to/project [--output /path/to/index.db]
+    python3 bsp_indexer.py /path/to/project [--output /path/to/index.db] [--full]
+
+    기존 인덱스가 있으면 mtime/size가 바뀐 파일만 다시 파싱한다 (증분).
 
 성능:
     - 10,000개 파일 기준 ~30초 (vs SSH 개별 읽기 ~10분)
+
+배포:
+    - 앱(IndexManager.startServerSideIndexing)은 이 파일이 아니라 IndexManager.ts에
+      내장된 INDEXER_SCRIPT 문자열(구버전 2.0-server)을 서버에 올려 실행한다.
+      내장 사본을 이 파일과 동기화하기 전까지는 증분/--full 등 이 파일의 변경이
+      앱에서 인덱싱하는 서버에 반영되지 않는다.
+    - 단일 파일 + 서버의 기본 python3로 실행되므로 표준 라이브러리만 사용한다.
 """
 
 import os
 import re
 import sys
 import json
+import mmap
+import fnmatch
 import sqlite3
-import hashlib
 import argparse
+from bisect import bisect_right
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+
+# DB 스키마/파싱 결과가 바뀌면 올린다 (다른 버전의 기존 인덱스는 재사용하지 않음)
+INDEXER_VERSION = '2.1-server'
 
 # 파일 확장자 매핑
 FILE_TYPES = {
@@ -40,11 +55,256 @@ EXCLUDE_PATTERNS = [
     '*/downloads/*',
 ]
 
+# 이름만으로 바로 제외할 디렉토리 (경로 문자열을 만들지 않고 스캔 중 가지치기)
+EXCLUDE_DIR_NAMES = {'.git', 'sstate-cache', 'downloads'}
+
+# EXCLUDE_PATTERNS 전체를 하나로 합친 정규식 (디렉토리마다 fnmatch를 패턴 수만큼 호출하지 않도록)
+_EXCLUDE_RE = re.compile('|'.join('(?:%s)' % fnmatch.translate(p) for p in EXCLUDE_PATTERNS))
+
+# 이 크기(바이트)보다 큰 파일은 read() 대신 mmap으로 파싱
+MMAP_THRESHOLD = 32 * 1024
+
+# 파서 정규식 (모듈 로드 시 한 번만 컴파일)
+# 파일 전체에 (?m)^ 로 한 번에 finditer 하므로 줄을 넘지 않도록 \s 대신 [^\S\n] 사용.
+# 앞뒤 공백 허용 규칙은 기존 line.strip() 기준과 동일하다 (끝 공백도 패턴에서 잘라내므로 strip 호출 없음).
+# 디코딩 비용을 피하기 위해 bytes 패턴으로 매칭하고, 저장할 그룹만 디코딩한다.
+
+# BitBake: VAR = "value" | require/include path | inherit cls...
+_BB_RE = re.compile(
+    rb'^[^\S\n]*(?:'
+    rb'(?P<var>[A-Za-z_][A-Za-z0-9_-]*)[^\S\n]*(?:\??\+?=|:=|\.=)[^\S\n]*["\']?'
+    rb'(?P<val>[^"\'\n]*(?=["\'])|(?:[^"\'\n]*[^"\'\s])?)'
+    rb'|(?P<inc>require|include)[^\S\n]+["\']?(?P<inc_path>[^"\'\s]+)'
+    rb'|inherit[^\S\n]+(?P<cls>.+)'
+    rb')',
+    re.MULTILINE,
+)
+
+# DTS: #include | 노드 시작 | 노드 끝 | 속성 (기존 if/continue 순서대로 alternation)
+_DTS_RE = re.compile(
+    rb'^[^\S\n]*(?:'
+    rb'#include[^\S\n]*[<"](?P<inc>[^>"\n]+)[>"]'
+    rb'|(?:(?P<label>\w+)[^\S\n]*:[^\S\n]*)?(?P<name>\S+?)(?:@(?P<address>[0-9a-fA-F]+))?[^\S\n]*\{'
+    rb'|(?P<close>\};?)[^\S\n]*$'
+    rb'|(?P<prop_name>[\w,#-]+)[^\S\n]*(?:=[^\S\n]*(?P<prop_value>.+?))?;[^\S\n]*$'
+    rb')',
+    re.MULTILINE,
+)
+_DTS_REF_RE = re.compile(rb'&(\w+)')
+
+# 헤더: #define MACRO value | #include
+# 리터럴 '#'로 시작해야 SRE가 '#'까지 바로 건너뛴다 (대부분의 줄은 선언/주석이라 후보 자체가 아님).
+# 줄 맨 앞(공백 제외)인지는 _parse_header에서 확인한다.
+_HDR_RE = re.compile(
+    rb'#(?:'
+    rb'define[^\S\n]+(?P<name>[A-Za-z_][A-Za-z0-9_]*)[^\S\n]*(?P<value>(?:.*\S)?)'
+    rb'|include[^\S\n]*[<"](?P<inc>[^>"\n]+)[>"]'
+    rb')'
+)
+
+_NEWLINE_RE = re.compile(rb'\n')
+
+
+def _newline_offsets(content: bytes) -> list:
+    """개행 위치 목록 (bisect_right(offsets, pos) + 1 == pos의 줄 번호)"""
+    return [m.start() for m in _NEWLINE_RE.finditer(content)]
+
+
+def _is_excluded(path: str) -> bool:
+    """간단한 glob 패턴 매칭 (프로젝트 기준 상대 경로)"""
+    return bool(_EXCLUDE_RE.match(path) or _EXCLUDE_RE.match('/' + path))
+
+
+def _decode(value: bytes) -> str:
+    """매칭된 그룹만 디코딩 (기존 텍스트 모드 읽기와 같이 잘못된 바이트는 무시)"""
+    if value is None:
+        return None
+    return value.decode('utf-8', 'ignore')
+
+
+def parse_file(file_info: dict) -> tuple:
+    """단일 파일 파싱 (워커 프로세스에서 실행되므로 모듈 레벨 함수)
+
+    executemany에 바로 넘길 수 있는 행 튜플 목록을 반환한다 (file_id/node_id는 삽입 시 채움):
+        file_row:   (path, name, type, size, mtime)
+        symbols:    (name, value, type, line)
+        includes:   (to_path, type, line)
+        dt_nodes:   [path, name, label, address, start_line, end_line, parent_index]  (end_line 갱신용 list)
+        dt_props:   (node_path, name, value, line)
+    """
+    content = None
+    try:
+        filepath = file_info['path']
+
+        with open(filepath, 'rb') as f:
+            if file_info['size'] > MMAP_THRESHOLD:
+                # 큰 파일은 읽어서 복사하지 않고 페이지 캐시를 직접 매칭
+                content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                content = f.read()
+
+        file_row = (
+            file_info['rel_path'],
+            file_info['name'],
+            file_info['type'],
+            file_info['size'],
+            file_info['mtime'],
+        )
+        symbols = []
+        includes = []
+        dt_nodes = []
+        dt_properties = []
+
+        if file_info['type'] == 'recipe' or file_info['type'] == 'config':
+            _parse_bitbake(content, symbols, includes)
+        elif file_info['type'] == 'dts':
+            _parse_dts(content, symbols, includes, dt_nodes, dt_properties)
+        elif file_info['type'] == 'header':
+            _parse_header(content, symbols, includes)
+
+        return file_row, symbols, includes, dt_nodes, dt_properties
+
+    except Exception as e:
+        return None
+
+    finally:
+        if isinstance(content, mmap.mmap):
+            content.close()
+
+
+def _parse_bitbake(content: bytes, symbols: list, includes: list):
+    """BitBake 파일 파싱"""
+    newlines = _newline_offsets(content)
+
+    for match in _BB_RE.finditer(content):
+        # 그룹은 groups()로 한 번에 꺼낸다 (매치당 인터프리터 호출 최소화)
+        var, val, inc, inc_path, cls_list = match.groups()
+        line_num = bisect_right(newlines, match.start()) + 1
+
+        # 변수 정의: VAR = "value" 또는 VAR ?= "value"
+        if var is not None:
+            symbols.append((
+                _decode(var),
+                _decode(val)[:200],  # 값 길이 제한
+                'variable',
+                line_num,
+            ))
+
+        # require/include
+        elif inc is not None:
+            includes.append((_decode(inc_path), _decode(inc), line_num))
+
+        # inherit
+        else:
+            classes = _decode(cls_list).split()
+            for cls in classes:
+                includes.append((f"classes/{cls}.bbclass", 'inherit', line_num))
+
+
+def _parse_dts(content: bytes, symbols: list, includes: list, dt_nodes: list, dt_properties: list):
+    """Device Tree 파싱"""
+    newlines = _newline_offsets(content)
+
+    node_stack = []  # (parent_path, dt_nodes 내 인덱스)
+    current_path = ''
+
+    for match in _DTS_RE.finditer(content):
+        inc, label, name, address, close, prop_name, prop_value = match.groups()
+        line_num = bisect_right(newlines, match.start()) + 1
+
+        # #include
+        if inc is not None:
+            includes.append((_decode(inc), '#include', line_num))
+
+        # 노드 정의: label: name@address { 또는 name { 또는 &label {
+        elif name is not None:
+            label = _decode(label)
+            name = _decode(name)
+            address = _decode(address)
+
+            if name.startswith('&'):
+                # 오버라이드 노드
+                new_path = name
+            else:
+                new_path = f"{current_path}/{name}" if current_path else f"/{name}"
+
+            # end_line은 닫는 브레이스에서 갱신, parent_index(dt_nodes 내 인덱스)는 삽입 시 parent_id로 변환
+            # (같은 라벨의 오버라이드가 중첩되면 경로만으로는 부모를 구분할 수 없다)
+            parent_index = node_stack[-1][1] if node_stack else None
+            dt_nodes.append([new_path, name, label, address, line_num, line_num, parent_index])
+
+            node_stack.append((current_path, len(dt_nodes) - 1))
+            current_path = new_path
+
+            # 라벨이 있으면 심볼로도 저장
+            if label:
+                symbols.append((label, new_path, 'label', line_num))
+
+        # 닫는 브레이스
+        elif close is not None:
+            if node_stack:
+                # 지금 닫히는 노드의 end_line 업데이트
+                parent_path, node_index = node_stack.pop()
+                dt_nodes[node_index][5] = line_num
+                current_path = parent_path
+
+        # 속성: name = value; 또는 name;
+        elif current_path:
+            prop_value = prop_value or b''
+
+            dt_properties.append((
+                current_path,
+                _decode(prop_name),
+                _decode(prop_value)[:500],  # 값 길이 제한
+                line_num,
+            ))
+
+            # &label 참조 추출
+            for ref_match in _DTS_REF_RE.finditer(prop_value):
+                ref_label = _decode(ref_match.group(1))
+                symbols.append((f"&{ref_label}", ref_label, 'label_ref', line_num))
+
+
+def _parse_header(content: bytes, symbols: list, includes: list):
+    """헤더 파일 파싱"""
+    newlines = _newline_offsets(content)
+
+    for match in _HDR_RE.finditer(content):
+        start = match.start()
+        line_idx = bisect_right(newlines, start)
+
+        # '#' 앞에 공백 외의 문자가 있으면 전처리 지시문이 아님
+        line_start = newlines[line_idx - 1] + 1 if line_idx else 0
+        if start > line_start and content[line_start:start].strip():
+            continue
+
+        name, value, inc = match.groups()
+        line_num = line_idx + 1
+
+        # #define MACRO value
+        if name is not None:
+            symbols.append((
+                _decode(name),
+                _decode(value)[:200],
+                'define',
+                line_num,
+            ))
+
+        # #include
+        else:
+            includes.append((_decode(inc), '#include', line_num))
+
+
 class BspIndexer:
-    def __init__(self, project_path: str, output_path: str = None):
+    def __init__(self, project_path: str, output_path: str = None, full: bool = False):
         self.project_path = Path(project_path).resolve()
         self.output_path = output_path or str(self.project_path / '.bsp-index' / 'index.bspidx')
+        self.full = full  # True면 기존 인덱스를 버리고 전체 재인덱싱
+        self.incremental = False
         self.conn = None
+        self.next_file_id = 1
+        self.next_node_id = 1
+        self.last_symbol_id = 0
         self.stats = {
             'files': 0,
             'symbols': 0,
@@ -68,13 +328,21 @@ class BspIndexer:
         
         # 파일 스캔
         files = self.scan_files()
-        print(f"[BSP Indexer] Found {len(files)} files to index")
+        print(f"[BSP Indexer] Found {len(files)} files")
+        
+        # 증분: 변경된 파일만 남기고 변경/삭제된 파일의 기존 행 제거
+        files = self.filter_changed_files(files)
+        print(f"[BSP Indexer] {len(files)} files to index")
         
         # 병렬 파싱
         self.parse_files_parallel(files)
         
+        # 인덱스 생성 (벌크 삽입 후)
+        self.create_indexes()
+        
         # 메타데이터 저장
         self.save_metadata()
+        self.load_stats()
         
         # 통계 출력
         elapsed = (datetime.now() - start_time).total_seconds()
@@ -92,17 +360,29 @@ class BspIndexer:
         return self.output_path
     
     def init_db(self):
-        """SQLite DB 초기화"""
-        # 기존 DB 삭제
-        if os.path.exists(self.output_path):
+        """SQLite DB 초기화
+
+        이전 실행이 정상 완료된 같은 버전의 DB가 있으면 재사용(증분), 아니면 새로 만든다.
+        배치 DB이므로 내구성 대신 적재 속도 위주로 설정한다. 저널은 메모리에만 두고
+        fsync도 하지 않으므로, 파일은 마지막 close() 시점에야 완전해진다. 중간에 죽으면
+        index_state가 'complete'로 남지 않으므로 다음 실행에서 DB를 새로 만든다.
+        """
+        self.incremental = not self.full and self._can_reuse_db()
+        
+        # 재사용할 수 없는 기존 DB 삭제
+        if not self.incremental and os.path.exists(self.output_path):
             os.remove(self.output_path)
         
         self.conn = sqlite3.connect(self.output_path)
-        self.conn.execute("PRAGMA journal_mode = WAL")
-        self.conn.execute("PRAGMA synchronous = NORMAL")
-        self.conn.execute("PRAGMA cache_size = -64000")
+        self.conn.execute("PRAGMA page_size = 32768")  # 테이블 생성 전에 설정해야 적용됨
+        self.conn.execute("PRAGMA journal_mode = MEMORY")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("PRAGMA temp_store = MEMORY")
+        self.conn.execute("PRAGMA locking_mode = EXCLUSIVE")
+        self.conn.execute("PRAGMA mmap_size = 268435456")  # 256MB
+        self.conn.execute("PRAGMA cache_size = -262144")  # 256MB 캐시
         
-        # 테이블 생성
+        # 테이블 생성 (인덱스와 FTS 내용은 벌크 삽입 후 create_indexes에서 생성)
         self.conn.executescript("""
             CREATE TABLE IF NOT EXISTS files (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -112,8 +392,6 @@ class BspIndexer:
                 size INTEGER,
                 mtime INTEGER
             );
-            CREATE INDEX IF NOT EXISTS idx_files_path ON files(path);
-            CREATE INDEX IF NOT EXISTS idx_files_type ON files(type);
             
             CREATE TABLE IF NOT EXISTS symbols (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -123,8 +401,6 @@ class BspIndexer:
                 file_id INTEGER,
                 line INTEGER NOT NULL
             );
-            CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name);
-            CREATE INDEX IF NOT EXISTS idx_symbols_file ON symbols(file_id);
             
             CREATE TABLE IF NOT EXISTS includes (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -133,8 +409,6 @@ class BspIndexer:
                 type TEXT NOT NULL,
                 line INTEGER NOT NULL
             );
-            CREATE INDEX IF NOT EXISTS idx_includes_from ON includes(from_file_id);
-            CREATE INDEX IF NOT EXISTS idx_includes_to ON includes(to_path);
             
             CREATE TABLE IF NOT EXISTS dt_nodes (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -147,9 +421,6 @@ class BspIndexer:
                 start_line INTEGER NOT NULL,
                 end_line INTEGER NOT NULL
             );
-            CREATE INDEX IF NOT EXISTS idx_dt_nodes_path ON dt_nodes(path);
-            CREATE INDEX IF NOT EXISTS idx_dt_nodes_label ON dt_nodes(label);
-            CREATE INDEX IF NOT EXISTS idx_dt_nodes_file ON dt_nodes(file_id);
             
             CREATE TABLE IF NOT EXISTS dt_properties (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -158,8 +429,6 @@ class BspIndexer:
                 value TEXT,
                 line INTEGER NOT NULL
             );
-            CREATE INDEX IF NOT EXISTS idx_dt_props_node ON dt_properties(node_id);
-            CREATE INDEX IF NOT EXISTS idx_dt_props_name ON dt_properties(name);
             
             CREATE TABLE IF NOT EXISTS gpio_pins (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -181,329 +450,335 @@ class BspIndexer:
                 name, value, content='symbols', content_rowid='id'
             );
             
-            -- FTS 트리거
-            CREATE TRIGGER IF NOT EXISTS symbols_ai AFTER INSERT ON symbols BEGIN
-                INSERT INTO symbols_fts(rowid, name, value) VALUES (new.id, new.name, new.value);
-            END;
+            -- FTS 동기화 트리거 제거: FTS는 create_indexes/delete_files에서 일괄 갱신한다.
+            -- 데스크톱 앱이 DB를 열면 트리거를 다시 만들고 서버로 올리기도 하므로,
+            -- 남아 있으면 행마다 토큰화되고 증분 실행에서 FTS가 이중으로 갱신된다.
+            DROP TRIGGER IF EXISTS symbols_ai;
+            DROP TRIGGER IF EXISTS symbols_ad;
+            DROP TRIGGER IF EXISTS symbols_au;
         """)
+        
+        # 완료 전까지는 'indexing' - 중단된 DB를 다음 실행에서 재사용하지 않기 위한 표시
+        self.conn.execute("INSERT OR REPLACE INTO metadata VALUES ('index_state', 'indexing')")
         self.conn.commit()
     
+    def _can_reuse_db(self) -> bool:
+        """기존 DB가 같은 프로젝트·같은 버전으로 정상 완료된 인덱스인지 확인"""
+        if not os.path.exists(self.output_path):
+            return False
+        
+        try:
+            conn = sqlite3.connect(self.output_path)
+            try:
+                meta = dict(conn.execute(
+                    "SELECT key, value FROM metadata WHERE key IN ('indexer_version', 'index_state', 'project_path')"
+                ))
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return False
+        
+        return (meta.get('indexer_version') == INDEXER_VERSION
+                and meta.get('index_state') == 'complete'
+                and meta.get('project_path') == str(self.project_path))
+    
     def scan_files(self) -> list:
         """파일 스캔"""
         files = []
         
-        for root, dirs, filenames in os.walk(self.project_path):
-            # 제외 패턴 체크
-            rel_root = os.path.relpath(root, self.project_path)
-            skip = False
-            for pattern in EXCLUDE_PATTERNS:
-                if self._match_pattern(rel_root, pattern):
-                    skip = True
-                    break
-            if skip:
-                dirs.clear()  # 하위 디렉토리도 스킵
+        for entry, rel_path in self._walk():
+            # 확장자 분류 (os.path.splitext와 동일하게 선행 '.'만 있는 이름은 제외)
+            base, _, ext = entry.name.rpartition('.')
+            file_type = FILE_TYPES.get('.' + ext.lower()) if base else None
+            if not file_type:
                 continue
             
-            for filename in filenames:
-                ext = os.path.splitext(filename)[1].lower()
-                if ext in FILE_TYPES:
-                    filepath = os.path.join(root, filename)
-                    files.append({
-                        'path': filepath,
-                        'name': filename,
-                        'type': FILE_TYPES[ext],
-                        'ext': ext,
-                    })
+            # 스캔 중 stat을 받아 두어 워커에서 다시 stat하지 않는다
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue  # 깨진 심볼릭 링크 등
+            
+            files.append({
+                'path': entry.path,
+                'rel_path': rel_path,
+                'name': entry.name,
+                'type': file_type,
+                'ext': '.' + ext.lower(),
+                'size': stat.st_size,
+                'mtime': int(stat.st_mtime),
+            })
         
         return files
     
-    def _match_pattern(self, path: str, pattern: str) -> bool:
-        """간단한 glob 패턴 매칭"""
-        import fnmatch
-        return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch('/' + path, pattern)
-    
-    def parse_files_parallel(self, files: list, max_workers: int = 8):
-        """병렬 파싱"""
-        total = len(files)
-        processed = 0
-        
-        # 배치 크기
-        batch_size = 100
+    def _walk(self):
+        """os.scandir 기반 반복 순회 - (DirEntry, 상대 경로)를 파일마다 yield
+
+        제외 디렉토리는 들어가기 전에 잘라내므로 하위 트리를 아예 읽지 않는다.
+        os.walk와 마찬가지로 디렉토리 심볼릭 링크는 따라가지 않는다.
+        """
+        stack = [(str(self.project_path), '')]
         
-        for i in range(0, len(files), batch_size):
-            batch = files[i:i+batch_size]
-            results = []
+        while stack:
+            dirpath, rel_dir = stack.pop()
+            try:
+                it = os.scandir(dirpath)
+            except OSError:
+                continue
             
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = {executor.submit(self.parse_file, f): f for f in batch}
-                for future in as_completed(futures):
+            with it:
+                for entry in it:
+                    rel_path = rel_dir + entry.name
                     try:
-                        result = future.result()
-                        if result:
-                            results.append(result)
-                    except Exception as e:
-                        pass  # 에러 무시
-            
-            # 배치 단위로 DB 삽입
-            self.insert_batch(results)
-            
-            processed += len(batch)
-            progress = processed / total * 100
-            print(f"\r[BSP Indexer] Progress: {processed}/{total} ({progress:.1f}%)", end='', flush=True)
-        
-        print()  # 줄바꿈
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    
+                    if not is_dir:
+                        yield entry, rel_path
+                        continue
+                    
+                    if entry.is_symlink() or entry.name in EXCLUDE_DIR_NAMES:
+                        continue
+                    if _is_excluded(rel_path + os.sep):
+                        continue
+                    stack.append((entry.path, rel_path + os.sep))
     
-    def parse_file(self, file_info: dict) -> dict:
-        """단일 파일 파싱"""
-        try:
-            filepath = file_info['path']
-            stat = os.stat(filepath)
-            
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-            
-            result = {
-                'file': {
-                    'path': os.path.relpath(filepath, self.project_path),
-                    'name': file_info['name'],
-                    'type': file_info['type'],
-                    'size': stat.st_size,
-                    'mtime': int(stat.st_mtime),
-                },
-                'symbols': [],
-                'includes': [],
-                'dt_nodes': [],
-                'dt_properties': [],
-            }
-            
-            if file_info['type'] == 'recipe' or file_info['type'] == 'config':
-                self._parse_bitbake(content, result)
-            elif file_info['type'] == 'dts':
-                self._parse_dts(content, result)
-            elif file_info['type'] == 'header':
-                self._parse_header(content, result)
-            
-            return result
-            
-        except Exception as e:
-            return None
+    def filter_changed_files(self, files: list) -> list:
+        """증분 인덱싱: mtime/size가 이전 인덱스와 같은 파일은 건너뛴다
+
+        변경된 파일과 디스크에서 사라진 파일의 기존 행은 여기서 지우고,
+        변경된 파일만 반환해 다시 파싱·삽입하게 한다.
+        """
+        if not self.incremental:
+            return files
+        
+        cursor = self.conn.cursor()
+        indexed = {
+            path: (file_id, mtime, size)
+            for file_id, path, mtime, size in cursor.execute("SELECT id, path, mtime, size FROM files")
+        }
+        
+        changed = []
+        stale_ids = []
+        for file_info in files:
+            old = indexed.pop(file_info['rel_path'], None)
+            if old is None:
+                changed.append(file_info)
+            elif old[1] != file_info['mtime'] or old[2] != file_info['size']:
+                changed.append(file_info)
+                stale_ids.append(old[0])
+        
+        # 남은 항목은 디스크에서 삭제된 파일
+        removed = len(indexed)
+        stale_ids.extend(file_id for file_id, _, _ in indexed.values())
+        
+        print(f"[BSP Indexer] Incremental: {len(files) - len(changed)} unchanged, "
+              f"{len(stale_ids) - removed} modified, {removed} removed")
+        
+        self.delete_files(stale_ids)
+        return changed
     
-    def _parse_bitbake(self, content: str, result: dict):
-        """BitBake 파일 파싱"""
-        lines = content.split('\n')
+    def delete_files(self, file_ids: list):
+        """파일과 그에 딸린 심볼/Include/DT 행 삭제 (FTS 항목 포함)"""
+        if not file_ids:
+            return
         
-        for i, line in enumerate(lines):
-            line_num = i + 1
-            stripped = line.strip()
-            
-            # 변수 정의: VAR = "value" 또는 VAR ?= "value"
-            match = re.match(r'^([A-Za-z_][A-Za-z0-9_-]*)\s*(\??\+?=|:=|\.=)\s*["\']?([^"\']*)', stripped)
-            if match:
-                result['symbols'].append({
-                    'name': match.group(1),
-                    'value': match.group(3)[:200],  # 값 길이 제한
-                    'type': 'variable',
-                    'line': line_num,
-                })
-            
-            # require/include
-            match = re.match(r'^(require|include)\s+["\'"]?([^"\'\s]+)', stripped)
-            if match:
-                result['includes'].append({
-                    'to_path': match.group(2),
-                    'type': match.group(1),
-                    'line': line_num,
-                })
-            
-            # inherit
-            match = re.match(r'^inherit\s+(.+)', stripped)
-            if match:
-                classes = match.group(1).split()
-                for cls in classes:
-                    result['includes'].append({
-                        'to_path': f"classes/{cls}.bbclass",
-                        'type': 'inherit',
-                        'line': line_num,
-                    })
+        cursor = self.conn.cursor()
+        cursor.execute("CREATE TEMP TABLE stale_files (id INTEGER PRIMARY KEY)")
+        cursor.executemany("INSERT INTO stale_files (id) VALUES (?)", ((file_id,) for file_id in file_ids))
+        cursor.executescript("""
+            -- external content FTS는 지우기 전에 원래 값으로 'delete' 해야 한다
+            INSERT INTO symbols_fts (symbols_fts, rowid, name, value)
+                SELECT 'delete', id, name, value FROM symbols
+                WHERE file_id IN (SELECT id FROM stale_files);
+            DELETE FROM symbols WHERE file_id IN (SELECT id FROM stale_files);
+            DELETE FROM includes WHERE from_file_id IN (SELECT id FROM stale_files);
+            DELETE FROM dt_properties WHERE node_id IN (
+                SELECT id FROM dt_nodes WHERE file_id IN (SELECT id FROM stale_files)
+            );
+            DELETE FROM dt_nodes WHERE file_id IN (SELECT id FROM stale_files);
+            DELETE FROM gpio_pins WHERE file_id IN (SELECT id FROM stale_files);
+            DELETE FROM files WHERE id IN (SELECT id FROM stale_files);
+            DROP TABLE stale_files;
+        """)
+        self.conn.commit()
     
-    def _parse_dts(self, content: str, result: dict):
-        """Device Tree 파싱"""
-        lines = content.split('\n')
+    def parse_files_parallel(self, files: list, max_workers: int = None):
+        """병렬 파싱
+
+        파싱은 CPU 바운드라 GIL을 피하기 위해 프로세스 풀을 사용한다.
+        풀은 전체 실행 동안 한 번만 만들고, DB 삽입은 메인 프로세스에서 처리한다.
+        """
+        total = len(files)
+        processed = 0
         
-        node_stack = []  # (path, label)
-        current_path = ''
+        # 자식 행이 참조할 ID를 미리 할당하기 위한 시작값
+        # (파싱할 파일이 없어도 읽어 둔다 - create_indexes가 last_symbol_id로 FTS 추가 범위를 정함)
+        cursor = self.conn.cursor()
+        self.next_file_id = self._next_id('files')
+        self.next_node_id = self._next_id('dt_nodes')
+        # 이 이후 id의 심볼만 FTS에 추가하면 된다 (증분)
+        self.last_symbol_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM symbols").fetchone()[0]
         
-        for i, line in enumerate(lines):
-            line_num = i + 1
-            stripped = line.strip()
-            
-            # #include
-            match = re.match(r'#include\s*[<"]([^>"]+)[>"]', stripped)
-            if match:
-                result['includes'].append({
-                    'to_path': match.group(1),
-                    'type': '#include',
-                    'line': line_num,
-                })
-                continue
-            
-            # 노드 정의: label: name@address { 또는 name { 또는 &label {
-            match = re.match(r'^(?:(\w+)\s*:\s*)?(\S+?)(?:@([0-9a-fA-F]+))?\s*\{', stripped)
-            if match:
-                label = match.group(1)
-                name = match.group(2)
-                address = match.group(3)
-                
-                if name.startswith('&'):
-                    # 오버라이드 노드
-                    new_path = name
-                else:
-                    new_path = f"{current_path}/{name}" if current_path else f"/{name}"
-                
-                node_stack.append((current_path, line_num))
-                current_path = new_path
-                
-                result['dt_nodes'].append({
-                    'path': new_path,
-                    'name': name,
-                    'label': label,
-                    'address': address,
-                    'start_line': line_num,
-                    'end_line': line_num,  # 나중에 업데이트
-                })
-                
-                # 라벨이 있으면 심볼로도 저장
-                if label:
-                    result['symbols'].append({
-                        'name': label,
-                        'value': new_path,
-                        'type': 'label',
-                        'line': line_num,
-                    })
-                continue
-            
-            # 닫는 브레이스
-            if stripped == '};' or stripped == '}':
-                if node_stack:
-                    parent_path, start_line = node_stack.pop()
-                    # 마지막 노드의 end_line 업데이트
-                    for node in reversed(result['dt_nodes']):
-                        if node['path'] == current_path:
-                            node['end_line'] = line_num
-                            break
-                    current_path = parent_path
-                continue
-            
-            # 속성: name = value; 또는 name;
-            match = re.match(r'^([\w,#-]+)\s*(?:=\s*(.+?))?;$', stripped)
-            if match and current_path:
-                prop_name = match.group(1)
-                prop_value = match.group(2) or ''
-                
-                result['dt_properties'].append({
-                    'node_path': current_path,
-                    'name': prop_name,
-                    'value': prop_value[:500],  # 값 길이 제한
-                    'line': line_num,
-                })
+        if not total:
+            return
+        
+        # 배치 크기 (DB 삽입 단위)
+        batch_size = 100
+        # 커밋 간격 (파일 수) - 그 사이의 배치는 하나의 트랜잭션으로 묶인다
+        commit_interval = 10000
+        uncommitted = 0
+        results = []
+        
+        # LPT 스케줄링: 큰 파일부터 하나씩 나눠 주고 나머지 작은 파일은 묶어서 보낸다.
+        # 큰 헤더가 한 워커에 몰려 마지막에 혼자 오래 도는 것을 막는다.
+        workers = max_workers or os.cpu_count() or 1
+        files.sort(key=lambda f: f['size'], reverse=True)
+        head = workers * 2
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = chain(
+                executor.map(parse_file, files[:head], chunksize=1),
+                executor.map(parse_file, files[head:], chunksize=32),
+            )
+            for result in parsed:
+                processed += 1
+                if result:
+                    results.append(result)
                 
-                # &label 참조 추출
-                for ref_match in re.finditer(r'&(\w+)', prop_value):
-                    ref_label = ref_match.group(1)
-                    result['symbols'].append({
-                        'name': f"&{ref_label}",
-                        'value': ref_label,
-                        'type': 'label_ref',
-                        'line': line_num,
-                    })
+                if len(results) >= batch_size or processed == total:
+                    # 배치 단위로 DB 삽입
+                    uncommitted += len(results)
+                    self.insert_batch(results)
+                    results = []
+                    
+                    if uncommitted >= commit_interval:
+                        self.conn.commit()
+                        uncommitted = 0
+                    
+                    progress = processed / total * 100
+                    print(f"\r[BSP Indexer] Progress: {processed}/{total} ({progress:.1f}%)", end='', flush=True)
+        
+        self.conn.commit()
+        print()  # 줄바꿈
     
-    def _parse_header(self, content: str, result: dict):
-        """헤더 파일 파싱"""
-        lines = content.split('\n')
+    def _next_id(self, table: str) -> int:
+        """AUTOINCREMENT 테이블에 직접 지정할 다음 ID (삭제된 ID는 재사용하지 않음)
         
-        for i, line in enumerate(lines):
-            line_num = i + 1
-            stripped = line.strip()
-            
-            # #define MACRO value
-            match = re.match(r'^#define\s+([A-Za-z_][A-Za-z0-9_]*)\s*(.*)', stripped)
-            if match:
-                result['symbols'].append({
-                    'name': match.group(1),
-                    'value': match.group(2)[:200],
-                    'type': 'define',
-                    'line': line_num,
-                })
-            
-            # #include
-            match = re.match(r'^#include\s*[<"]([^>"]+)[>"]', stripped)
-            if match:
-                result['includes'].append({
-                    'to_path': match.group(1),
-                    'type': '#include',
-                    'line': line_num,
-                })
+        명시적 ID 삽입도 sqlite_sequence.seq를 갱신하고 삭제 후에도 그 값이 유지되므로,
+        MAX(id)가 아니라 seq에서 이어 가야 증분 실행에서 지워진 끝번호가 다시 쓰이지 않는다.
+        """
+        return self.conn.execute(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0) + 1", (table,)
+        ).fetchone()[0]
     
     def insert_batch(self, results: list):
-        """배치 DB 삽입"""
-        cursor = self.conn.cursor()
+        """배치 DB 삽입
+
+        file/dt_node ID를 파이썬에서 미리 할당해 lastrowid 조회 없이
+        테이블별로 executemany 한 번씩만 호출한다. 커밋은 호출자가 담당.
+        """
+        files_rows = []
+        symbols_rows = []
+        includes_rows = []
+        dt_nodes_rows = []
+        dt_props_rows = []
         
         for result in results:
             if not result:
                 continue
             
-            # 파일 삽입
-            cursor.execute("""
-                INSERT OR REPLACE INTO files (path, name, type, size, mtime)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                result['file']['path'],
-                result['file']['name'],
-                result['file']['type'],
-                result['file']['size'],
-                result['file']['mtime'],
-            ))
-            file_id = cursor.lastrowid
-            self.stats['files'] += 1
+            file_row, symbols, includes, dt_nodes, dt_properties = result
             
-            # 심볼 삽입
-            for sym in result['symbols']:
-                cursor.execute("""
-                    INSERT INTO symbols (name, value, type, file_id, line)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (sym['name'], sym.get('value'), sym['type'], file_id, sym['line']))
-                self.stats['symbols'] += 1
+            # 파일
+            file_id = self.next_file_id
+            self.next_file_id += 1
+            files_rows.append((file_id,) + file_row)
             
-            # Include 삽입
-            for inc in result['includes']:
-                cursor.execute("""
-                    INSERT INTO includes (from_file_id, to_path, type, line)
-                    VALUES (?, ?, ?, ?)
-                """, (file_id, inc['to_path'], inc['type'], inc['line']))
-                self.stats['includes'] += 1
+            # 심볼 / Include
+            symbols_rows.extend((name, value, type_, file_id, line) for name, value, type_, line in symbols)
+            includes_rows.extend((file_id,) + inc for inc in includes)
             
-            # DT 노드 삽입
-            node_id_map = {}  # path -> id
-            for node in result['dt_nodes']:
-                cursor.execute("""
-                    INSERT INTO dt_nodes (file_id, path, name, label, address, parent_id, start_line, end_line)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    file_id, node['path'], node['name'], node.get('label'),
-                    node.get('address'), None, node['start_line'], node['end_line']
+            # DT 노드 (파싱 순서상 부모가 항상 자식보다 먼저 나온다)
+            node_id_map = {}  # path -> id (속성 연결용)
+            node_ids = []     # dt_nodes 인덱스 -> id (부모 연결용)
+            for path, name, label, address, start_line, end_line, parent_index in dt_nodes:
+                node_id = self.next_node_id
+                self.next_node_id += 1
+                parent_id = node_ids[parent_index] if parent_index is not None else None
+                dt_nodes_rows.append((
+                    node_id, file_id, path, name, label, address, parent_id, start_line, end_line
                 ))
-                node_id_map[node['path']] = cursor.lastrowid
-                self.stats['dt_nodes'] += 1
+                node_ids.append(node_id)
+                node_id_map[path] = node_id
             
-            # DT 속성 삽입
-            for prop in result['dt_properties']:
-                node_id = node_id_map.get(prop['node_path'])
+            # DT 속성
+            for node_path, name, value, line in dt_properties:
+                node_id = node_id_map.get(node_path)
                 if node_id:
-                    cursor.execute("""
-                        INSERT INTO dt_properties (node_id, name, value, line)
-                        VALUES (?, ?, ?, ?)
-                    """, (node_id, prop['name'], prop.get('value'), prop['line']))
+                    dt_props_rows.append((node_id, name, value, line))
+        
+        cursor = self.conn.cursor()
+        cursor.executemany("""
+            INSERT OR REPLACE INTO files (id, path, name, type, size, mtime)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, files_rows)
+        cursor.executemany("""
+            INSERT INTO symbols (name, value, type, file_id, line)
+            VALUES (?, ?, ?, ?, ?)
+        """, symbols_rows)
+        cursor.executemany("""
+            INSERT INTO includes (from_file_id, to_path, type, line)
+            VALUES (?, ?, ?, ?)
+        """, includes_rows)
+        cursor.executemany("""
+            INSERT INTO dt_nodes (id, file_id, path, name, label, address, parent_id, start_line, end_line)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, dt_nodes_rows)
+        cursor.executemany("""
+            INSERT INTO dt_properties (node_id, name, value, line)
+            VALUES (?, ?, ?, ?)
+        """, dt_props_rows)
+        
+        self.stats['files'] += len(files_rows)
+        self.stats['symbols'] += len(symbols_rows)
+        self.stats['includes'] += len(includes_rows)
+        self.stats['dt_nodes'] += len(dt_nodes_rows)
+    
+    def create_indexes(self):
+        """벌크 삽입 후 인덱스 생성 + FTS 재구축
+
+        행마다 B-tree/FTS를 갱신하지 않고 적재가 끝난 뒤 한 번에 정렬·토큰화한다.
+        증분 실행에서는 인덱스가 이미 있으므로 새로 삽입된 심볼만 FTS에 추가한다.
+        """
+        self.conn.executescript("""
+            BEGIN;
+            CREATE INDEX IF NOT EXISTS idx_files_path ON files(path);
+            CREATE INDEX IF NOT EXISTS idx_files_type ON files(type);
+            CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name);
+            CREATE INDEX IF NOT EXISTS idx_symbols_file ON symbols(file_id);
+            CREATE INDEX IF NOT EXISTS idx_includes_from ON includes(from_file_id);
+            CREATE INDEX IF NOT EXISTS idx_includes_to ON includes(to_path);
+            CREATE INDEX IF NOT EXISTS idx_dt_nodes_path ON dt_nodes(path);
+            CREATE INDEX IF NOT EXISTS idx_dt_nodes_label ON dt_nodes(label);
+            CREATE INDEX IF NOT EXISTS idx_dt_nodes_file ON dt_nodes(file_id);
+            CREATE INDEX IF NOT EXISTS idx_dt_nodes_parent ON dt_nodes(parent_id);
+            CREATE INDEX IF NOT EXISTS idx_dt_props_node ON dt_properties(node_id);
+            CREATE INDEX IF NOT EXISTS idx_dt_props_name ON dt_properties(name);
+            COMMIT;
+        """)
         
+        # FTS5 전문 검색 (external content 테이블을 한 번에 채움)
+        if self.incremental:
+            if not self.stats['symbols']:
+                return  # 이번 실행에서 삽입한 심볼 없음
+            self.conn.execute("""
+                INSERT INTO symbols_fts (rowid, name, value)
+                SELECT id, name, value FROM symbols WHERE id > ?
+            """, (self.last_symbol_id,))
+        else:
+            self.conn.execute("INSERT INTO symbols_fts(symbols_fts) VALUES ('rebuild')")
         self.conn.commit()
     
     def save_metadata(self):
@@ -514,32 +789,42 @@ class BspIndexer:
         cursor.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?)",
                       ('project_path', str(self.project_path)))
         cursor.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?)",
-                      ('indexer_version', '2.0-server'))
+                      ('indexer_version', INDEXER_VERSION))
+        cursor.execute("INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+                      ('index_state', 'complete'))
         self.conn.commit()
     
+    def load_stats(self):
+        """통계를 DB 전체 기준으로 갱신 (증분 실행 시 이번에 삽입한 행만 세지 않도록)"""
+        cursor = self.conn.cursor()
+        for table in ('files', 'symbols', 'includes', 'dt_nodes', 'gpio_pins'):
+            self.stats[table] = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    
     def save_meta_json(self, elapsed: float):
         """meta.json 저장"""
         meta = {
             'lastSaved': datetime.now().isoformat(),
             'savedBy': os.environ.get('USER', os.environ.get('USERNAME', 'unknown')),
-            'indexerVersion': '2.0-server',
+            'indexerVersion': INDEXER_VERSION,
             'elapsed': round(elapsed, 1),
             'stats': self.stats,
         }
         
         meta_path = os.path.join(os.path.dirname(self.output_path), 'meta.json')
-        with open(meta_path, 'w') as f:
-            json.dump(meta, f, indent=2)
+        # 앱에서 JSON.parse로만 읽으므로 들여쓰기 없이 C 인코더 경로로 저장
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(',', ':'))
 
 
 def main():
     parser = argparse.ArgumentParser(description='BSP Indexer - 서버 측 고속 인덱싱')
     parser.add_argument('project_path', help='Yocto/BSP 프로젝트 경로')
     parser.add_argument('--output', '-o', help='출력 DB 경로 (기본: {project}/.bsp-index/index.bspidx)')
+    parser.add_argument('--full', action='store_true', help='기존 인덱스를 무시하고 전체 재인덱싱')
     
     args = parser.parse_args()
     
-    indexer = BspIndexer(args.project_path, args.output)
+    indexer = BspIndexer(args.project_path, args.output, full=args.full)
     output_path = indexer.run()
     
     print(f"\n✅ Index saved: {output_path}")
@@ -800,6 +800,7 @@ export class IndexManager {
   /**
    * Python 인덱서 스크립트 (서버에 배포)
    * 내장: 서버에서 로컬 I/O로 초고속 인덱싱
+   * 주의: scripts/bsp_indexer.py(2.1-server, 증분 인덱싱)보다 오래된 사본 - 동기화 필요
    */
   private readonly INDEXER_SCRIPT = `#!/usr/bin/env python3
 """